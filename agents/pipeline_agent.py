@@ -1,187 +1,266 @@
 """
 pipeline_agent.py: Orchestrates the workflow from search to LLM-based extraction, deduplication, and output.
-- Uses only LLM-based extraction (GPT-4o) for all tool info fields in a single call per tool,
-  with ToolInfo from models.tool_info and prompts from prompts/ loaded via utils/prompt_loader.
+- Uses only LLM-based extraction (GPT-4o) for all tool info fields in a single call per batch
+  of LLM_BATCH_SIZE pages, with ToolInfo from models.tool_info and prompts from prompts/ loaded via utils/prompt_loader.
 - LLM input truncation limit is set in config/constants.py.
 """
 import asyncio
 import logging
 from datetime import datetime, timezone, timedelta
+from typing import AsyncGenerator
 
 import aiohttp
 from openai import RateLimitError
-from tqdm import tqdm
+from tqdm.asyncio import tqdm_asyncio
 
 from models.tool_info import ToolInfo
-from config.constants import BATCH_SIZE, LLM_CONCURRENCY_LIMIT
+from config.constants import LLM_BATCH_SIZE, LLM_CONCURRENCY_LIMIT, HTTP_CONCURRENCY_LIMIT, HTTP_PER_HOST_LIMIT
 from agents.search_agent import run_search
 from agents.scraper_agent import (
     fetch_with_retries,
-    extract_tool_info_with_llm,
+    extract_tool_info_batch_with_llm,
+    is_near_empty,
+    prepare_page_text,
     blacklist,
 )
+from utils.error_handling import ExtractionError, MalformedBatchError
+from utils.prompt_loader import close_session as close_robots_session
+from utils.retry import retry_delay
+
 _llm_semaphore = asyncio.Semaphore(LLM_CONCURRENCY_LIMIT)
 
 
+def _make_resolver() -> aiohttp.abc.AbstractResolver:
+    """Use the c-ares backed AsyncResolver when aiodns is installed, else aiohttp's threaded default."""
+    try:
+        return aiohttp.AsyncResolver()
+    except RuntimeError:
+        logging.info("aiodns not installed, falling back to threaded DNS resolution")
+        return aiohttp.DefaultResolver()
+
+
 class PipelineContext:
-    """Async context manager for pipeline resources (shared aiohttp session)."""
+    """Async context manager for pipeline resources (shared aiohttp session).
+
+    A single session is used for every search and fetch request in a run so that
+    TCP/TLS connections are pooled and kept alive instead of rebuilt per call.
+    The robots.txt session from utils.prompt_loader is closed on exit as well.
+    """
 
     def __init__(self) -> None:
         self.session: aiohttp.ClientSession | None = None
 
     async def __aenter__(self) -> "PipelineContext":
-        self.session = aiohttp.ClientSession()
+        # aiohttp's default connector (limit=100, no per-host cap) is the main throughput
+        # bottleneck for bursty fan-out and lets one slow host hog the pool. Raise the total
+        # limit, cap per-host connections, and resolve each host once per run (async c-ares
+        # resolver, 10-minute DNS cache shared by first attempts and retries alike).
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_CONCURRENCY_LIMIT,
+            limit_per_host=HTTP_PER_HOST_LIMIT,
+            enable_cleanup_closed=True,
+            resolver=_make_resolver(),
+            use_dns_cache=True,
+            ttl_dns_cache=600,
+        )
+        # DummyCookieJar: never carry cookies between Serper and the scraped sites.
+        self.session = aiohttp.ClientSession(connector=connector, cookie_jar=aiohttp.DummyCookieJar())
         return self
 
     async def __aexit__(self, exc_type, exc, tb) -> None:
         if self.session:
             await self.session.close()
+        await close_robots_session()
 
 
-async def _extract_throttled(html: str, url: str) -> ToolInfo:
-    """Run LLM extraction with concurrency throttling."""
+async def _extract_throttled(items: list[tuple[str, str]]) -> list[ToolInfo]:
+    """Run batched LLM extraction with concurrency throttling."""
     async with _llm_semaphore:
-        return await extract_tool_info_with_llm(html, url)
+        return await extract_tool_info_batch_with_llm(items)
 
 
-async def _extract_with_retry(html: str, url: str, retries: int = 3, delay: float = 10) -> ToolInfo:
-    """Run throttled LLM extraction with retry on rate-limit errors."""
+async def _extract_with_retry(
+    items: list[tuple[str, str]], retries: int = 3, delay: float = 10
+) -> list[ToolInfo]:
+    """Run throttled batched LLM extraction with retry on rate-limit errors.
+    Waits for the server's retry-after-ms / Retry-After hint when given, else jittered backoff.
+    """
     for attempt in range(retries):
         try:
-            return await _extract_throttled(html, url)
-        except RateLimitError:
+            return await _extract_throttled(items)
+        except RateLimitError as e:
             if attempt < retries - 1:
-                logging.warning(f"Rate limited for {url}, retrying in {delay}s (attempt {attempt + 1}/{retries})")
-                await asyncio.sleep(delay)
+                wait = retry_delay(getattr(e.response, "headers", None), attempt, base=delay)
+                logging.warning(
+                    f"Rate limited for batch of {len(items)}, retrying in {wait:.1f}s (attempt {attempt + 1}/{retries})"
+                )
+                await asyncio.sleep(wait)
             else:
                 raise
-    return ToolInfo(title="", website=url, summary="", source=url, ai_tool_annotation="not_ai_tool")
+    return []
 
 
 async def fetch_all_html(
     urls: list[str], session: aiohttp.ClientSession
 ) -> tuple[dict[str, str], list[dict]]:
-    """Fetch HTML for all URLs in batches with progress reporting."""
+    """Fetch HTML for all URLs through a bounded worker pool with per-URL progress reporting."""
     html_map: dict[str, str] = {}
     error_list: list[dict] = []
-
-    for i in tqdm(range(0, len(urls), BATCH_SIZE), desc="Fetching HTML", unit="batch"):
-        batch = urls[i : i + BATCH_SIZE]
-        tasks = [fetch_with_retries(url, session) for url in batch]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-
-        for url, result in zip(batch, results):
-            if isinstance(result, Exception):
-                context = getattr(result, "context", {})
-                logging.error(f"Error fetching {url}: {result} | Context: {context}")
-                error_list.append({"url": url, "error": str(result), "context": context})
-                html_map[url] = ""
-            else:
-                html_map[url] = result
+    sem = asyncio.Semaphore(HTTP_CONCURRENCY_LIMIT)
+
+    async def guarded(url: str) -> tuple[str, str | Exception]:
+        async with sem:
+            try:
+                return url, await fetch_with_retries(url, session)
+            except Exception as e:
+                return url, e
+
+    tasks = [guarded(url) for url in urls]
+    for coro in tqdm_asyncio.as_completed(tasks, total=len(tasks), desc="Fetching HTML", unit="url"):
+        url, result = await coro
+        if isinstance(result, Exception):
+            context = getattr(result, "context", {})
+            logging.error(f"Error fetching {url}: {result} | Context: {context}")
+            error_list.append({"url": url, "error": str(result), "context": context})
+            html_map[url] = ""
+        else:
+            html_map[url] = result
 
     return html_map, error_list
 
 
-async def extract_all_tool_info(html_map: dict[str, str]) -> list[ToolInfo]:
-    """Extract tool info from all fetched HTML pages using parallel throttled LLM calls."""
-    urls_and_htmls = [(url, html) for url, html in html_map.items() if html]
-    if not urls_and_htmls:
+async def _extract_or_split(items: list[tuple[str, str]]) -> list[ToolInfo]:
+    """Extract one batch, halving it and retrying each half if the response is malformed.
+    Failures that survive down to a single page are logged and dropped so one bad page
+    can't abort the run. Other errors (auth, network, timeouts) fail the batch once
+    without splitting, since smaller batches would hit them too.
+    """
+    try:
+        return await _extract_with_retry(items)
+    except MalformedBatchError as e:
+        if len(items) == 1:
+            logging.error(f"Extraction failed for {items[0][0]}: {e} | Context: {e.context}")
+            return []
+        mid = len(items) // 2
+        logging.warning(f"Batch of {len(items)} failed ({e}), retrying as batches of {mid} and {len(items) - mid}")
+        left, right = await asyncio.gather(_extract_or_split(items[:mid]), _extract_or_split(items[mid:]))
+        return left + right
+    except ExtractionError as e:
+        logging.error(f"Extraction failed for batch of {len(items)}: {e} | Context: {e.context}")
+        return []
+    except Exception as e:
+        logging.error(f"Extraction failed for {[url for url, _ in items]}: {e}")
         return []
-
-    tasks = [_extract_with_retry(html, url) for url, html in urls_and_htmls]
-
-    results: list[ToolInfo] = []
-    with tqdm(total=len(tasks), desc="LLM Extraction", unit="tool") as pbar:
-        for coro in asyncio.as_completed(tasks):
-            result = await coro
-            results.append(result)
-            pbar.update(1)
-
-    return results
 
 
-def _deduplicate(tools: list[ToolInfo]) -> list[ToolInfo]:
-    """Deduplicate tools by (website, title) pair."""
+async def iter_tool_info(html_map: dict[str, str]) -> AsyncGenerator[ToolInfo, None]:
+    """Yield extracted tool info from all fetched HTML pages as each LLM batch completes.
+    Pages are grouped into batches of LLM_BATCH_SIZE per call; all batches are scheduled
+    at once and `_llm_semaphore` caps how many run concurrently.
+    """
+    # Extract each page's main text once up front; near-empty checks and every batch split reuse it.
+    pages = [
+        (url, page_text)
+        for url, html in html_map.items()
+        if not is_near_empty(page_text := prepare_page_text(html, url))
+    ]
+    if not pages:
+        return
+
+    batches = [pages[i : i + LLM_BATCH_SIZE] for i in range(0, len(pages), LLM_BATCH_SIZE)]
+    tasks = [_extract_or_split(batch) for batch in batches]
+    for coro in tqdm_asyncio.as_completed(tasks, total=len(tasks), desc="LLM Extraction", unit="batch"):
+        for tool in await coro:
+            yield tool
+
+
+def _is_recent(tool: ToolInfo, cutoff_ts: float) -> bool:
+    """Check whether a tool was published at or after the cutoff epoch timestamp.
+    The prompt asks for ISO-8601 dates, so a single fromisoformat parse covers both
+    date-only and full timestamps; naive values are treated as UTC. Missing or
+    unparseable dates count as recent.
+    """
+    if not tool.publish_date:
+        return True
+    try:
+        pub_date = datetime.fromisoformat(tool.publish_date.replace("Z", "+00:00"))
+    except ValueError:
+        return True
+    if pub_date.tzinfo is None:
+        pub_date = pub_date.replace(tzinfo=timezone.utc)
+    return pub_date.timestamp() >= cutoff_ts
+
+
+async def collect_ai_tools(html_map: dict[str, str], days: int = 7) -> list[ToolInfo]:
+    """Stream extraction results, keeping only recent, unique AI tools.
+    Classification, deduplication by (website, title), and the recency filter are applied
+    as each result arrives, so rejected tools are released immediately instead of being
+    held in intermediate lists.
+    """
+    cutoff_ts = (datetime.now(timezone.utc) - timedelta(days=days)).timestamp()
     seen: set[tuple[str, str]] = set()
-    deduped: list[ToolInfo] = []
-    for t in tools:
-        key = (t.website.lower(), t.title.lower())
-        if key not in seen:
-            seen.add(key)
-            deduped.append(t)
-    return deduped
-
-
-def _filter_by_recency(tools: list[ToolInfo], days: int = 7) -> list[ToolInfo]:
-    """Keep only tools published within the last N days (or with unparseable/missing dates)."""
-    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
-    filtered: list[ToolInfo] = []
-
-    for tool in tools:
-        if not tool.publish_date:
-            filtered.append(tool)
-            continue
-        try:
-            if "T" in tool.publish_date:
-                pub_date = datetime.fromisoformat(tool.publish_date.replace("Z", "+00:00"))
-            else:
-                pub_date = datetime.strptime(tool.publish_date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    ai_tools: list[ToolInfo] = []
 
-            if pub_date >= cutoff:
-                filtered.append(tool)
-        except (ValueError, TypeError):
-            filtered.append(tool)
+    async for tool in iter_tool_info(html_map):
+        if tool.ai_tool_annotation != "ai_tool":
+            continue
+        key = (tool.website.lower(), tool.title.lower())
+        if key in seen:
+            continue
+        seen.add(key)
+        if _is_recent(tool, cutoff_ts):
+            ai_tools.append(tool)
 
-    return filtered
+    return ai_tools
 
 
-def _print_summary_report(
-    html_map: dict[str, str], error_list: list[dict]
+def _log_summary_report(
+    html_map: dict[str, str], error_list: list[dict], blacklisted_domains: list[str]
 ) -> None:
-    """Print error summary and fetch statistics."""
+    """Log error summary, fetch statistics, and blacklisted domains as a single record."""
+    if not logging.getLogger().isEnabledFor(logging.INFO):
+        return
+
+    lines: list[str] = []
     if error_list:
-        print("\n=== Error Summary ===")
+        lines.append("=== Error Summary ===")
         for err in error_list:
-            print(f"URL: {err['url']}")
-            print(f"Error: {err['error']}")
+            lines.append(f"URL: {err['url']}")
+            lines.append(f"Error: {err['error']}")
             if err.get("context"):
-                print(f"Context: {err['context']}")
-            print("-" * 40)
+                lines.append(f"Context: {err['context']}")
+            lines.append("-" * 40)
 
     num_total = len(html_map)
     num_success = sum(1 for html in html_map.values() if html)
     num_fail = len(error_list)
 
-    print(f"\n=== Summary Report ===")
-    print(f"Total URLs processed: {num_total}")
-    print(f"Successful fetches:   {num_success}")
-    print(f"Failed fetches:       {num_fail}")
-    print(f"Skipped (robots/empty): {num_total - num_success - num_fail}")
+    lines.append("=== Summary Report ===")
+    lines.append(f"Total URLs processed: {num_total}")
+    lines.append(f"Successful fetches:   {num_success}")
+    lines.append(f"Failed fetches:       {num_fail}")
+    lines.append(f"Skipped (robots/empty): {num_total - num_success - num_fail}")
+
+    if blacklisted_domains:
+        lines.append("=== Blacklisted Domains (Persistent) ===")
+        lines.extend(f"  {domain}" for domain in blacklisted_domains)
+
+    logging.info("\n" + "\n".join(lines))
 
 
 async def run_pipeline() -> list[ToolInfo]:
     """Execute the full discovery pipeline: search -> fetch -> extract -> filter -> output."""
     async with PipelineContext() as ctx:
-        urls = await run_search()
+        urls = await run_search(ctx.session)
         if not urls:
             logging.info("No URLs found during search phase.")
             return []
 
         html_map, error_list = await fetch_all_html(urls, ctx.session)
 
-        tools = await extract_all_tool_info(html_map)
-
-        ai_tools = [t for t in tools if t.ai_tool_annotation == "ai_tool"]
-        ai_tools = _deduplicate(ai_tools)
-        ai_tools = _filter_by_recency(ai_tools)
-
-        _print_summary_report(html_map, error_list)
+        ai_tools = await collect_ai_tools(html_map)
 
         blacklist.save()
-        blacklisted_domains = blacklist.summary()
-        if blacklisted_domains:
-            print("\n=== Blacklisted Domains (Persistent) ===")
-            for domain in blacklisted_domains:
-                print(f"  {domain}")
+        _log_summary_report(html_map, error_list, blacklist.summary())
 
         return ai_tools
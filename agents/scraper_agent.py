@@ -1,36 +1,56 @@
 """
 scraper_agent.py: Async HTML fetching and LLM-based tool info extraction using GPT-4o (Azure OpenAI).
 - Uses ToolInfo dataclass from models.tool_info.
-- All extraction, summarization, and classification is performed in a single LLM call per tool
-  using prompts from prompts/ loaded via utils/prompt_loader.
-- LLM input truncation limit is set in config/constants.py.
+- All extraction, summarization, and classification is performed in a single LLM call per batch
+  of pages (or per tool) using prompts from prompts/ loaded via utils/prompt_loader.
+- HTML is reduced to its main text content before the LLM input truncation limit
+  (set in config/constants.py) is applied.
 """
 import asyncio
-import json
 import logging
 import re
-from typing import Optional
+from typing import Any, Optional, TypeVar
 from urllib.parse import urlparse
 
 import aiohttp
-from openai import AsyncAzureOpenAI
+import msgspec
+import orjson
+from openai import AsyncAzureOpenAI, BadRequestError, RateLimitError
 
 from agents.config_agent import AZURE_OPENAI_KEY, AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_DEPLOYMENT
-from config.constants import LLM_INPUT_TRUNCATION_LIMIT, DEFAULT_HEADERS, NON_RETRYABLE_STATUS_CODES
+from config.constants import (
+    LLM_INPUT_TRUNCATION_LIMIT,
+    MAIN_TEXT_PREVIEW_LIMIT,
+    MIN_HTML_LENGTH,
+    DEFAULT_HEADERS,
+    NON_RETRYABLE_STATUS_CODES,
+)
+from models.llm_response import LLMBatchItem, LLMBatchResponse, LLMToolResponse
 from models.tool_info import ToolInfo
+from utils import html_cache
 from utils.blacklist import PersistentBlacklist
-from utils.error_handling import ScrapingError, ExtractionError
+from utils.domain import normalize as normalize_domain
+from utils.error_handling import ScrapingError, ExtractionError, MalformedBatchError
+from utils.html_text import extract_main_content
 from utils.prompt_loader import load_prompt, is_allowed_by_robots
+from utils.retry import backoff_delay, retry_delay
 
-_html_fetch_cache: dict[str, str] = {}
+# Statuses whose Retry-After header is honoured before retrying
+_RETRY_AFTER_STATUS_CODES = frozenset({429, 503})
+
+_Schema = TypeVar("_Schema", LLMToolResponse, LLMBatchResponse)
+
+_FENCE_RE = re.compile(r"^```(?:json)?|```$", re.MULTILINE)
+_JSON_OBJ_RE = re.compile(r"\{.*\}", re.DOTALL)
 
 blacklist = PersistentBlacklist()
 
 _client: Optional[AsyncAzureOpenAI] = None
 _deployment: str = ""
 
-_system_prompt: Optional[str] = None
-_user_prompt_template: Optional[str] = None
+_SYSTEM_PROMPT = load_prompt("system_prompt.txt")
+_USER_PROMPT_TEMPLATE = load_prompt("user_prompt.txt")
+_BATCH_PROMPT_TEMPLATE = load_prompt("batch_user_prompt.txt")
 
 
 def _get_client() -> AsyncAzureOpenAI:
@@ -50,51 +70,60 @@ def _get_client() -> AsyncAzureOpenAI:
     return _client
 
 
-def _get_prompts() -> tuple[str, str]:
-    """Load and cache prompt templates from disk (loaded once per process)."""
-    global _system_prompt, _user_prompt_template
-    if _system_prompt is None:
-        _system_prompt = load_prompt("system_prompt.txt")
-        _user_prompt_template = load_prompt("user_prompt.txt")
-    return _system_prompt, _user_prompt_template
-
-
 async def fetch_with_retries(
     url: str, session: aiohttp.ClientSession, retries: int = 3, timeout: int = 30
 ) -> str:
-    """Fetch HTML from a URL with retries and exponential backoff.
-    Skips blacklisted domains and non-retryable status codes.
+    """Fetch HTML from a URL with retries and jittered exponential backoff.
+    Honours Retry-After on 429/503 responses. Skips blacklisted domains and non-retryable status codes.
+    Serves fresh pages from the on-disk HTML cache and revalidates stale ones
+    with conditional requests. Cache reads and writes run in worker threads.
     """
     parsed = urlparse(url)
-    domain = parsed.netloc
+    domain = normalize_domain(parsed.netloc)
 
     if blacklist.is_blacklisted(domain):
         logging.warning(f"Domain {domain} is blacklisted. Skipping fetch for {url}.")
-        _html_fetch_cache[url] = ""
         return ""
 
-    delay = 2
+    cached = await html_cache.get_entry_async(url)
+    if cached is not None and html_cache.is_fresh(cached):
+        return cached.html
+
+    headers = {**DEFAULT_HEADERS, **html_cache.conditional_headers(cached)} if cached else DEFAULT_HEADERS
+
+    if not await is_allowed_by_robots(url, DEFAULT_HEADERS["User-Agent"]):
+        logging.warning(f"robots.txt disallows scraping {url}. Skipping fetch.")
+        return ""
+
     for attempt in range(retries):
         try:
-            allowed = await is_allowed_by_robots(url)
-            if not allowed:
-                logging.warning(f"robots.txt disallows scraping {url}. Skipping fetch.")
-                _html_fetch_cache[url] = ""
-                return ""
-
             async with session.get(
                 url,
                 timeout=aiohttp.ClientTimeout(total=timeout),
                 ssl=False,
-                headers=DEFAULT_HEADERS,
+                headers=headers,
             ) as resp:
+                if resp.status == 304 and cached:
+                    await html_cache.put_async(
+                        url,
+                        cached.html,
+                        etag=resp.headers.get("ETag", cached.etag),
+                        last_modified=resp.headers.get("Last-Modified", cached.last_modified),
+                    )
+                    return cached.html
+
                 if resp.status == 200:
                     html = await resp.text(encoding=resp.charset or "utf-8", errors="replace")
-                    _html_fetch_cache[url] = html or ""
-                    return _html_fetch_cache[url]
+                    if html:
+                        await html_cache.put_async(
+                            url,
+                            html,
+                            etag=resp.headers.get("ETag"),
+                            last_modified=resp.headers.get("Last-Modified"),
+                        )
+                    return html or ""
 
                 if resp.status in NON_RETRYABLE_STATUS_CODES:
-                    _html_fetch_cache[url] = ""
                     blacklist.record_failure(domain)
                     raise ScrapingError(
                         f"HTTP {resp.status} for {url}",
@@ -102,12 +131,12 @@ async def fetch_with_retries(
                     )
 
                 if attempt < retries - 1:
-                    logging.warning(f"HTTP {resp.status} for {url}, retrying after {delay}s...")
+                    hints = resp.headers if resp.status in _RETRY_AFTER_STATUS_CODES else None
+                    delay = retry_delay(hints, attempt, base=2)
+                    logging.warning(f"HTTP {resp.status} for {url}, retrying after {delay:.1f}s...")
                     await asyncio.sleep(delay)
-                    delay *= 2
                     continue
 
-                _html_fetch_cache[url] = ""
                 blacklist.record_failure(domain)
                 raise ScrapingError(
                     f"HTTP {resp.status} for {url}",
@@ -116,11 +145,10 @@ async def fetch_with_retries(
 
         except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             if attempt < retries - 1:
-                logging.warning(f"Connection error for {url}: {e}, retrying after {delay}s...")
+                delay = backoff_delay(attempt, base=2)
+                logging.warning(f"Connection error for {url}: {e}, retrying after {delay:.1f}s...")
                 await asyncio.sleep(delay)
-                delay *= 2
                 continue
-            _html_fetch_cache[url] = ""
             blacklist.record_failure(domain)
             raise ScrapingError(
                 f"Connection error for {url}: {e}",
@@ -129,7 +157,6 @@ async def fetch_with_retries(
         except ScrapingError:
             raise
         except Exception as e:
-            _html_fetch_cache[url] = ""
             blacklist.record_failure(domain)
             raise ScrapingError(
                 f"Unexpected error for {url}: {e}",
@@ -139,72 +166,141 @@ async def fetch_with_retries(
     return ""
 
 
-def _parse_llm_json(raw: str | None) -> dict | None:
-    """Extract and parse JSON from an LLM response that may contain markdown fences."""
+def _decode_llm_json(raw: str | None, schema: type[_Schema]) -> _Schema | None:
+    """Decode and validate an LLM JSON response straight into a msgspec schema.
+    Requests use response_format=json_object, so the response is normally bare JSON
+    and decodes in one pass; the markdown-fence cleanup only runs as a fallback.
+    Returns None if no valid object can be decoded.
+    """
     if not raw:
         return None
 
+    try:
+        return msgspec.json.decode(raw, type=schema)
+    except msgspec.ValidationError as e:
+        logging.warning(f"LLM JSON did not match {schema.__name__}: {e}")
+        return None
+    except msgspec.DecodeError:
+        pass
+
     content = raw.strip()
     if content.startswith("```"):
-        content = re.sub(r"^```(?:json)?|```$", "", content, flags=re.MULTILINE).strip()
+        content = _FENCE_RE.sub("", content).strip()
 
-    match = re.search(r"\{.*\}", content, re.DOTALL)
+    match = _JSON_OBJ_RE.search(content)
     if match:
-        return json.loads(match.group(0))
+        try:
+            return msgspec.json.decode(match.group(0), type=schema)
+        except msgspec.DecodeError as e:
+            logging.warning(f"LLM JSON did not match {schema.__name__}: {e}")
 
     return None
 
 
+def is_near_empty(page_text: str) -> bool:
+    """True for pages too short to describe a tool (blacklisted, robots-blocked, stub or script-only pages).
+    Takes the output of prepare_page_text, so SPA shells whose markup is all scripts count as empty.
+    """
+    return not page_text or len(page_text.strip()) < MIN_HTML_LENGTH
+
+
+def prepare_page_text(html: str, url: str) -> str:
+    """Strip HTML down to its main text content, then cut it to the LLM input budget.
+    Stripping first means the budget is spent on page content rather than on
+    inline scripts and navigation markup.
+    """
+    if not html:
+        return ""
+    content = extract_main_content(html)
+    if len(content) > LLM_INPUT_TRUNCATION_LIMIT:
+        logging.warning(f"Content for {url} truncated to {LLM_INPUT_TRUNCATION_LIMIT} chars for LLM prompt.")
+    return content[:LLM_INPUT_TRUNCATION_LIMIT]
+
+
+def _as_str_list(value: Any) -> list[str]:
+    """Coerce an LLM list field (list, comma-separated string, or null) to a list of strings."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [part.strip() for part in value.split(",") if part.strip()]
+    return [str(item) for item in value if item]
+
+
+def _tool_info_from_data(data: LLMToolResponse, url: str, html_trunc: str) -> ToolInfo:
+    """Build a ToolInfo from one decoded LLM response object."""
+    website = data.website or url
+    source = data.source_url or url
+    annotation = data.ai_tool_annotation or "not_ai_tool"
+    logging.info(
+        f"LLM result: Title='{data.title or ''}', "
+        f"Website='{website}', ai_tool_annotation='{annotation}'"
+    )
+    return ToolInfo(
+        title=data.title or "",
+        website=website,
+        summary=data.core_functionality or data.summary or "",
+        features=_as_str_list(data.key_features),
+        pricing=str(data.pricing) if data.pricing else None,
+        source=source,
+        target_audience=data.target_audience or None,
+        main_text=html_trunc[:MAIN_TEXT_PREVIEW_LIMIT],
+        ai_tool_annotation=annotation,
+        tags=_as_str_list(data.tags),
+        publish_date=data.publish_date or None,
+    )
+
+
+def _fallback_tool_info(url: str, html_trunc: str) -> ToolInfo:
+    """ToolInfo returned when the LLM gives no usable result for a page."""
+    return ToolInfo(
+        title="",
+        website=url,
+        summary="",
+        features=[],
+        source=url,
+        main_text=html_trunc[:MAIN_TEXT_PREVIEW_LIMIT],
+        ai_tool_annotation="not_ai_tool",
+        tags=[],
+    )
+
+
 async def extract_tool_info_with_llm(html: str, url: str) -> ToolInfo:
     """
     Use GPT-4o to extract all relevant tool info fields from raw HTML and URL in a single call.
     Returns a ToolInfo with ai_tool_annotation set to 'ai_tool' or 'not_ai_tool'.
+    Near-empty pages are classified 'not_ai_tool' without spending an LLM call.
     """
-    client = _get_client()
-    system_prompt, user_prompt_template = _get_prompts()
+    return await _extract_page_text(url, prepare_page_text(html, url))
+
+
+async def _extract_page_text(url: str, html_trunc: str) -> ToolInfo:
+    """Single-page LLM extraction from text already prepared by prepare_page_text."""
+    if is_near_empty(html_trunc):
+        return _fallback_tool_info(url, "")
 
-    html_trunc = html[:LLM_INPUT_TRUNCATION_LIMIT] if html else ""
-    if html and len(html) > LLM_INPUT_TRUNCATION_LIMIT:
-        logging.warning(f"HTML for {url} truncated to {LLM_INPUT_TRUNCATION_LIMIT} chars for LLM prompt.")
+    client = _get_client()
 
-    user_prompt = user_prompt_template.format(url=url, html_trunc=html_trunc)
+    user_prompt = _USER_PROMPT_TEMPLATE.format(url=url, html_trunc=html_trunc)
 
     try:
         response = await client.chat.completions.create(
             model=_deployment,
             messages=[
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": _SYSTEM_PROMPT},
                 {"role": "user", "content": user_prompt},
             ],
             max_tokens=800,
             temperature=0.4,
+            response_format={"type": "json_object"},
         )
 
-        data = _parse_llm_json(response.choices[0].message.content)
-        if data:
-            website = data.get("Website") or url
-            source = data.get("Source URL") or url
-            logging.info(
-                f"LLM result: Title='{data.get('Title', '')}', "
-                f"Website='{website}', ai_tool_annotation='{data.get('ai_tool_annotation', '')}'"
-            )
-            return ToolInfo(
-                title=data.get("Title", ""),
-                website=website,
-                summary=data.get("Core Functionality", "") or data.get("Summary", ""),
-                features=data.get("Key Features", []),
-                pricing=data.get("Pricing") or None,
-                source=source,
-                target_audience=data.get("Target Audience") or None,
-                main_text=html_trunc,
-                ai_tool_annotation=data.get("ai_tool_annotation", "not_ai_tool"),
-                tags=data.get("Tags", []),
-                publish_date=data.get("Publish Date") or None,
-            )
+        data = _decode_llm_json(response.choices[0].message.content, LLMToolResponse)
+        if data is not None:
+            return _tool_info_from_data(data, url, html_trunc)
 
         logging.warning(f"LLM extraction returned non-JSON for {url}")
 
-    except ExtractionError:
+    except (ExtractionError, RateLimitError):
         raise
     except Exception as e:
         logging.error(f"LLM extraction failed for {url}: {e!r}", exc_info=True)
@@ -213,13 +309,91 @@ async def extract_tool_info_with_llm(html: str, url: str) -> ToolInfo:
             context={"url": url, "step": "extract_tool_info_with_llm", "error": str(e)},
         )
 
-    return ToolInfo(
-        title="",
-        website=url,
-        summary="",
-        features=[],
-        source=url,
-        main_text=html_trunc,
-        ai_tool_annotation="not_ai_tool",
-        tags=[],
-    )
+    return _fallback_tool_info(url, html_trunc)
+
+
+async def extract_tool_info_batch_with_llm(items: list[tuple[str, str]]) -> list[ToolInfo]:
+    """
+    Use GPT-4o to extract tool info for several (url, page_text) pages in a single call.
+    Page text must already be prepared with prepare_page_text, so it is extracted once
+    per page rather than again on every batch split.
+    The system prompt is sent once per batch instead of once per page. Results are
+    mapped back to their pages by index; near-empty pages and pages the model skipped
+    get a 'not_ai_tool' fallback. Raises MalformedBatchError if the response is not a well-formed
+    batch or the prompt overflows the context window, so the caller can retry with smaller batches;
+    any other failure raises a plain ExtractionError.
+    """
+    skipped = {i for i, (_, page_text) in enumerate(items) if is_near_empty(page_text)}
+    if skipped:
+        live = [item for i, item in enumerate(items) if i not in skipped]
+        extracted = iter(await extract_tool_info_batch_with_llm(live) if live else [])
+        return [_fallback_tool_info(url, "") if i in skipped else next(extracted) for i, (url, _) in enumerate(items)]
+
+    if len(items) == 1:
+        url, page_text = items[0]
+        return [await _extract_page_text(url, page_text)]
+
+    client = _get_client()
+
+    pages = orjson.dumps(
+        [{"idx": i, "url": url, "html": page_text} for i, (url, page_text) in enumerate(items)]
+    ).decode()
+    user_prompt = _BATCH_PROMPT_TEMPLATE.format(count=len(items), pages=pages)
+    urls = [url for url, _ in items]
+
+    try:
+        response = await client.chat.completions.create(
+            model=_deployment,
+            messages=[
+                {"role": "system", "content": _SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt},
+            ],
+            max_tokens=800 * len(items),
+            temperature=0.4,
+            response_format={"type": "json_object"},
+        )
+        data = _decode_llm_json(response.choices[0].message.content, LLMBatchResponse)
+    except RateLimitError:
+        raise
+    except BadRequestError as e:
+        if e.code == "context_length_exceeded":
+            raise MalformedBatchError(
+                f"Batch of {len(items)} URLs exceeded the model context window",
+                context={"urls": urls, "step": "extract_tool_info_batch_with_llm", "error": str(e)},
+            )
+        logging.error(f"Batch LLM extraction failed for {len(items)} URLs: {e!r}")
+        raise ExtractionError(
+            f"Batch LLM extraction failed for {len(items)} URLs: {e}",
+            context={"urls": urls, "step": "extract_tool_info_batch_with_llm", "error": str(e)},
+        )
+    except Exception as e:
+        logging.error(f"Batch LLM extraction failed for {len(items)} URLs: {e!r}", exc_info=True)
+        raise ExtractionError(
+            f"Batch LLM extraction failed for {len(items)} URLs: {e}",
+            context={"urls": urls, "step": "extract_tool_info_batch_with_llm", "error": str(e)},
+        )
+
+    if data is None or not data.results:
+        raise MalformedBatchError(
+            f"Batch LLM extraction returned malformed JSON for {len(items)} URLs",
+            context={"urls": urls, "step": "extract_tool_info_batch_with_llm"},
+        )
+
+    by_idx: dict[int, LLMBatchItem] = {}
+    for raw in data.results:
+        try:
+            item = msgspec.json.decode(raw, type=LLMBatchItem)
+        except msgspec.DecodeError as e:
+            # Leave this entry's page to the per-page fallback below instead of failing the batch.
+            logging.warning(f"Skipping malformed batch LLM result: {e}")
+            continue
+        by_idx[item.idx] = item
+    tools: list[ToolInfo] = []
+    for i, (url, html_trunc) in enumerate(items):
+        entry = by_idx.get(i)
+        if entry is not None:
+            tools.append(_tool_info_from_data(entry, url, html_trunc))
+        else:
+            logging.warning(f"Batch LLM extraction returned no result for {url}")
+            tools.append(_fallback_tool_info(url, html_trunc))
+    return tools
@@ -2,40 +2,59 @@
 search_agent.py: Handles all search engine logic, query construction, and aggregator/news filtering.
 """
 import asyncio
+import functools
+import itertools
 import logging
 from datetime import datetime, timedelta, timezone
 from typing import List, Set
-from urllib.parse import urlparse, urlunparse
+from urllib.parse import ParseResult, urlparse, urlunparse
 
 import aiohttp
 
 from agents.config_agent import SERPER_API_KEY, SERPAPI_API_KEY
-from config.constants import AGGREGATOR_DOMAINS, BATCH_SIZE, BASE_QUERIES
+from config.constants import AGGREGATOR_DOMAIN_KEYS, BASE_QUERIES, SERPER_RATE_LIMIT, SERPAPI_RATE_LIMIT
+from utils.domain import normalize as normalize_domain
+from utils.rate_limit import AsyncTokenBucket
+from utils.retry import retry_delay
+
+_serper_bucket = AsyncTokenBucket(SERPER_RATE_LIMIT)
+_serpapi_bucket = AsyncTokenBucket(SERPAPI_RATE_LIMIT)
+
+
+def _normalize_parsed(parsed: ParseResult) -> str:
+    return urlunparse((parsed.scheme, parsed.netloc, parsed.path, "", "", ""))
 
 
 def normalize_url(url: str) -> str:
     """Normalize URL by removing query parameters and fragments for deduplication."""
     try:
-        parsed = urlparse(url)
-        return urlunparse((parsed.scheme, parsed.netloc, parsed.path, "", "", ""))
+        return _normalize_parsed(urlparse(url))
     except Exception as e:
         logging.warning(f"Failed to normalize URL {url}: {e}")
         return url
 
 
+def _is_aggregator_domain(domain: str) -> bool:
+    """Check the domain and each of its parent suffixes against AGGREGATOR_DOMAIN_KEYS.
+    Costs one set lookup per DNS label instead of a scan over every aggregator entry.
+    """
+    if domain in AGGREGATOR_DOMAIN_KEYS:
+        return True
+    dot = domain.find(".")
+    while dot != -1:
+        if domain[dot + 1 :] in AGGREGATOR_DOMAIN_KEYS:
+            return True
+        dot = domain.find(".", dot + 1)
+    return False
+
+
 def is_aggregator(url: str) -> bool:
     """Check if a URL belongs to an aggregator, news, or social media domain.
-    Handles TLD patterns (e.g. '.edu') when the entry starts with '.'.
+    The normalized host and each of its parent suffixes are looked up in AGGREGATOR_DOMAIN_KEYS,
+    so 'cs.stanford.edu' matches the 'edu' entry and 'm.youtube.com' matches 'youtube.com'.
     """
     try:
-        domain = urlparse(url).netloc.lower()
-        for agg in AGGREGATOR_DOMAINS:
-            if agg.startswith("."):
-                if domain.endswith(agg):
-                    return True
-            elif domain == agg or domain.endswith("." + agg):
-                return True
-        return False
+        return _is_aggregator_domain(normalize_domain(urlparse(url).netloc))
     except Exception as e:
         logging.warning(f"Failed to check if URL {url} is aggregator: {e}")
         return True
@@ -47,87 +66,128 @@ def get_search_queries() -> List[str]:
     return [f"{q} after:{last_7_days}" for q in BASE_QUERIES]
 
 
-async def search_web_for_ai_tools_serper(query: str, num_results: int = 38) -> List[str]:
-    """Search for AI tools using the Serper.dev API."""
+async def search_web_for_ai_tools_serper(
+    query: str, session: aiohttp.ClientSession, num_results: int = 38, retries: int = 3
+) -> List[str]:
+    """Search for AI tools using the Serper.dev API over the shared pipeline session.
+    Requests are paced by a token bucket; on HTTP 429 the bucket rate is halved and
+    the query is retried after the server's Retry-After delay.
+    """
     url = "https://google.serper.dev/search"
     headers = {"X-API-KEY": SERPER_API_KEY, "Content-Type": "application/json"}
     params = {"q": query, "gl": "us", "hl": "en", "num": num_results}
 
     try:
-        async with aiohttp.ClientSession() as session:
+        for attempt in range(retries):
+            await _serper_bucket.acquire()
             async with session.post(url, json=params, headers=headers) as resp:
+                if resp.status == 429 and attempt < retries - 1:
+                    delay = retry_delay(resp.headers, attempt, base=1)
+                    _serper_bucket.throttle(delay)
+                    logging.warning(f"Serper rate limited, retrying in {delay:.1f}s (rate now {_serper_bucket.rate:.2f}/s)")
+                    continue
                 if resp.status != 200:
                     logging.error(f"Serper API error: {resp.status} - {await resp.text()}")
                     return []
+                _serper_bucket.record_success()
                 data = await resp.json()
                 urls = [r["link"] for r in data.get("organic", []) if "link" in r]
                 logging.info(f"Serper query '{query[:50]}...' returned {len(urls)} results")
                 return urls
+        return []
     except Exception as e:
         logging.error(f"Serper search failed for query '{query[:50]}...': {e}")
         return []
 
 
-async def search_web_for_ai_tools_serpapi(query: str, num_results: int = 38) -> List[str]:
-    """Search for AI tools using the SerpAPI."""
+async def search_web_for_ai_tools_serpapi(
+    query: str, session: aiohttp.ClientSession, num_results: int = 38, retries: int = 3
+) -> List[str]:
+    """Search for AI tools using SerpAPI's JSON endpoint over the shared pipeline session.
+    Requests are paced by a token bucket; on HTTP 429 the bucket rate is halved and
+    the query is retried after the server's Retry-After delay.
+    """
+    url = "https://serpapi.com/search.json"
+    params = {
+        "q": query,
+        "api_key": SERPAPI_API_KEY,
+        "num": num_results,
+        "hl": "en",
+        "gl": "us",
+        "engine": "google",
+    }
+
     try:
-        from serpapi import GoogleSearch
-
-        params = {
-            "q": query,
-            "api_key": SERPAPI_API_KEY,
-            "num": num_results,
-            "hl": "en",
-            "gl": "us",
-            "engine": "google",
-        }
-
-        loop = asyncio.get_running_loop()
-        search = GoogleSearch(params)
-        results = await loop.run_in_executor(None, search.get_dict)
-
-        urls = [r["link"] for r in results.get("organic_results", []) if "link" in r]
-        logging.info(f"SerpAPI query '{query[:50]}...' returned {len(urls)} results")
-        return urls
+        for attempt in range(retries):
+            await _serpapi_bucket.acquire()
+            async with session.get(url, params=params) as resp:
+                if resp.status == 429 and attempt < retries - 1:
+                    delay = retry_delay(resp.headers, attempt, base=1)
+                    _serpapi_bucket.throttle(delay)
+                    logging.warning(f"SerpAPI rate limited, retrying in {delay:.1f}s (rate now {_serpapi_bucket.rate:.2f}/s)")
+                    continue
+                if resp.status != 200:
+                    logging.error(f"SerpAPI error: {resp.status} - {await resp.text()}")
+                    return []
+                _serpapi_bucket.record_success()
+                data = await resp.json(content_type=None)
+                if data.get("error"):
+                    logging.error(f"SerpAPI error for query '{query[:50]}...': {data['error']}")
+                    return []
+                urls = [r["link"] for r in data.get("organic_results", []) if "link" in r]
+                logging.info(f"SerpAPI query '{query[:50]}...' returned {len(urls)} results")
+                return urls
+        return []
     except Exception as e:
-        logging.error(f"SerpAPI search failed for query '{query[:50]}...': {e}")
+        # aiohttp errors embed the request URL, whose query string carries the API key.
+        message = str(e).replace(SERPAPI_API_KEY, "***") if SERPAPI_API_KEY else str(e)
+        logging.error(f"SerpAPI search failed for query '{query[:50]}...': {type(e).__name__}: {message}")
         return []
 
 
 async def _run_engine(search_fn, queries: List[str]) -> list:
-    """Run all queries against a single search engine in batches."""
-    results = []
-    for i in range(0, len(queries), BATCH_SIZE):
-        batch = queries[i : i + BATCH_SIZE]
-        batch_results = await asyncio.gather(
-            *(search_fn(query, num_results=38) for query in batch),
-            return_exceptions=True,
-        )
-        results.extend(batch_results)
-        if i + BATCH_SIZE < len(queries):
-            await asyncio.sleep(1)
-    return results
-
-
-async def run_search() -> List[str]:
+    """Run all queries against a single search engine concurrently.
+    Pacing is left to each engine's token bucket rather than fixed batches and sleeps.
+    """
+    return await asyncio.gather(
+        *(search_fn(query, num_results=38) for query in queries),
+        return_exceptions=True,
+    )
+
+
+async def run_search(session: aiohttp.ClientSession) -> List[str]:
     """Run search across Serper and SerpAPI, returning unique non-aggregator URLs."""
     queries = get_search_queries()
     logging.info(f"Starting search with {len(queries)} queries")
 
     serper_results, serpapi_results = await asyncio.gather(
-        _run_engine(search_web_for_ai_tools_serper, queries),
-        _run_engine(search_web_for_ai_tools_serpapi, queries),
+        _run_engine(functools.partial(search_web_for_ai_tools_serper, session=session), queries),
+        _run_engine(functools.partial(search_web_for_ai_tools_serpapi, session=session), queries),
     )
 
-    urls: Set[str] = set()
-    for api_results in [serper_results, serpapi_results]:
+    query_results: List[List[str]] = []
+    for api_results in (serper_results, serpapi_results):
         for i, result in enumerate(api_results):
             if isinstance(result, Exception):
                 logging.error(f"Search query {i} failed: {result}")
                 continue
-            for url in result:
-                if not is_aggregator(url):
-                    urls.add(normalize_url(url))
+            query_results.append(result)
+
+    # Engines return many of the same links; skip raw repeats before parsing, then
+    # parse each URL once and reuse it for both the aggregator check and normalization.
+    seen: Set[str] = set()
+    urls: Set[str] = set()
+    for url in itertools.chain.from_iterable(query_results):
+        if url in seen:
+            continue
+        seen.add(url)
+        try:
+            parsed = urlparse(url)
+        except ValueError as e:
+            logging.warning(f"Skipping unparseable URL {url}: {e}")
+            continue
+        if not _is_aggregator_domain(normalize_domain(parsed.netloc)):
+            urls.add(_normalize_parsed(parsed))
 
     logging.info(f"Found {len(urls)} unique non-aggregator URLs")
     return list(urls)
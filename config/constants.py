@@ -1,8 +1,13 @@
 # Global constants for the AI Tool Discovery Agent
 
-LLM_INPUT_TRUNCATION_LIMIT = 15_000  # Max HTML chars sent to LLM
+from types import MappingProxyType
+from typing import Final, Mapping
 
-AGGREGATOR_DOMAINS = frozenset([
+LLM_INPUT_TRUNCATION_LIMIT = 15_000  # Max chars of extracted page text sent to LLM
+MAIN_TEXT_PREVIEW_LIMIT = 300  # Chars of page text kept on ToolInfo.main_text (overview fallback)
+MIN_HTML_LENGTH = 200  # Pages whose extracted main text is shorter than this skip LLM extraction
+
+AGGREGATOR_DOMAINS: Final[frozenset[str]] = frozenset([
     # Social media & video
     "youtube.com", "youtu.be", "reddit.com", "linkedin.com", "facebook.com",
     "twitter.com", "x.com", "tiktok.com", "instagram.com", "pinterest.com",
@@ -48,19 +53,29 @@ AGGREGATOR_DOMAINS = frozenset([
     "medium.com", "substack.com", "news.ycombinator.com", "hackernews.com", "hacker-news.com",
 ])
 
-BATCH_SIZE = 4
+# Lowercased, dot-stripped aggregator keys. A host is an aggregator if the host itself or any
+# of its dot-separated suffixes (e.g. 'cs.stanford.edu' -> 'stanford.edu' -> 'edu') is a key.
+AGGREGATOR_DOMAIN_KEYS: Final[frozenset[str]] = frozenset(d.lower().lstrip(".") for d in AGGREGATOR_DOMAINS)
+
+SERPER_RATE_LIMIT = 10.0  # Serper requests per second (halved automatically on HTTP 429)
+SERPAPI_RATE_LIMIT = 4.0  # SerpAPI requests per second
 LLM_CONCURRENCY_LIMIT = 2
+LLM_BATCH_SIZE = 5  # Pages extracted per LLM call (halved automatically on malformed responses)
+HTTP_CONCURRENCY_LIMIT = 128  # Max open connections in the shared aiohttp connector
+HTTP_PER_HOST_LIMIT = 8  # Max open connections to any single host
+TEAMS_CONCURRENCY_LIMIT = 4  # Max in-flight Teams webhook posts (webhooks are rate limited)
 
-BASE_QUERIES = [
+BASE_QUERIES: Final[tuple[str, ...]] = (
     '"launched new AI tool" OR "released new AI tool" OR "announced new AI tool" OR "introducing new AI tool" OR "AI tool just launched" OR "new AI tool released" OR "AI tool now available" OR "new AI tool available" OR "AI tool beta launch" OR "AI tool preview launch" OR "AI tool demo launch"',
     '"AI app" OR "AI platform" OR "AI product" OR "AI startup" OR "AI SaaS" OR "AI-powered"',
     '"AI tool update" OR "AI tool integration" OR "AI tool feature" OR "AI tool partnership" OR "AI tool API" OR "AI tool SaaS" OR "AI tool for" OR "AI-powered tool"',
     '"AI tool directory" OR "AI marketplace" OR "AI website"',
     '"new from" OR "just released" OR "now available" OR "new AI software launch" OR "new AI app launch" OR "AI tool free launch" OR "AI tool open source launch"',
     'site:.com OR site:.io OR site:.ai OR site:.co OR site:.app OR site:.dev OR site:.tech OR site:.org',
-]
+)
 
-DEFAULT_HEADERS = {
+# Read-only view so no caller can mutate the headers shared by every request.
+DEFAULT_HEADERS: Final[Mapping[str, str]] = MappingProxyType({
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8",
     "Accept-Language": "en-US,en;q=0.9",
@@ -74,6 +89,6 @@ DEFAULT_HEADERS = {
     "Cache-Control": "max-age=0",
     "Pragma": "no-cache",
     "Referer": "https://www.google.com/",
-}
+})
 
-NON_RETRYABLE_STATUS_CODES = frozenset({403, 404})
+NON_RETRYABLE_STATUS_CODES: Final[frozenset[int]] = frozenset({403, 404})
@@ -5,26 +5,44 @@ Sets up logging, runs the async pipeline, prints results, and optionally posts t
 import asyncio
 import os
 
+import aiohttp
+
 from agents.config_agent import setup_logging, validate_critical_config
 from agents.pipeline_agent import run_pipeline
+from config.constants import TEAMS_CONCURRENCY_LIMIT
+from models.tool_info import ToolInfo
 from output.console import print_summary
-from output.teams import send_tool_to_teams
+from output.teams import send_tool_to_teams_async
 
 TEAMS_WEBHOOK_URL = os.environ.get("TEAMS_WEBHOOK_URL")
 
 
+async def _run() -> None:
+    """Run the pipeline, print the results, and post AI tools to Teams concurrently.
+    At most TEAMS_CONCURRENCY_LIMIT posts are in flight, since Teams webhooks are rate limited.
+    """
+    tools = await run_pipeline()
+    print_summary(tools)
+
+    if TEAMS_WEBHOOK_URL:
+        sem = asyncio.Semaphore(TEAMS_CONCURRENCY_LIMIT)
+
+        async def post(tool: ToolInfo, idx: int, session: aiohttp.ClientSession) -> None:
+            async with sem:
+                await send_tool_to_teams_async(tool, idx, TEAMS_WEBHOOK_URL, session)
+
+        async with aiohttp.ClientSession() as session:
+            await asyncio.gather(*(
+                post(tool, i, session) for i, tool in enumerate(tools, 1) if tool.ai_tool_annotation == "ai_tool"
+            ))
+
+
 def main() -> None:
     setup_logging()
     validate_critical_config()
 
     print("Running AI Tool Discovery Agent...")
-    tools = asyncio.run(run_pipeline())
-    print_summary(tools)
-
-    if TEAMS_WEBHOOK_URL:
-        for i, tool in enumerate(tools, 1):
-            if tool.ai_tool_annotation == "ai_tool":
-                send_tool_to_teams(tool, i, TEAMS_WEBHOOK_URL)
+    asyncio.run(_run())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,51 @@
+from typing import Any, List, Optional, Union
+
+import msgspec
+
+
+class LLMToolResponse(
+    msgspec.Struct,
+    rename={
+        "title": "Title",
+        "website": "Website",
+        "core_functionality": "Core Functionality",
+        "summary": "Summary",
+        "target_audience": "Target Audience",
+        "key_features": "Key Features",
+        "pricing": "Pricing",
+        "source_url": "Source URL",
+        "tags": "Tags",
+        "publish_date": "Publish Date",
+    },
+):
+    """JSON object the LLM returns for a single page (see prompts/user_prompt.txt).
+    List fields and Pricing are typed loosely because the model sometimes returns null,
+    a comma-separated string, or an object there; _tool_info_from_data normalizes them.
+    """
+
+    title: Optional[str] = None
+    website: Optional[str] = None
+    core_functionality: Optional[str] = None
+    summary: Optional[str] = None
+    target_audience: Optional[str] = None
+    key_features: Union[List[Any], str, None] = []
+    pricing: Any = None
+    source_url: Optional[str] = None
+    tags: Union[List[Any], str, None] = []
+    publish_date: Optional[str] = None
+    ai_tool_annotation: Optional[str] = "not_ai_tool"
+
+
+class LLMBatchItem(LLMToolResponse):
+    """One page's result inside a batched LLM response, keyed by its input index."""
+
+    idx: int = -1
+
+
+class LLMBatchResponse(msgspec.Struct):
+    """JSON object the LLM returns for a batch of pages (see prompts/batch_user_prompt.txt).
+    Results are kept raw and decoded into LLMBatchItem one at a time, so a single
+    malformed entry can't invalidate the rest of the batch.
+    """
+
+    results: List[msgspec.Raw] = []
@@ -2,7 +2,7 @@ from dataclasses import dataclass, field
 from typing import Optional, List
 
 
-@dataclass
+@dataclass(slots=True)
 class ToolInfo:
     """Structured information about a discovered AI tool."""
 
@@ -1,50 +1,74 @@
+import asyncio
 import logging
 import re
+from itertools import islice
 
+import aiohttp
 import requests
 
 from models.tool_info import ToolInfo
+from utils.retry import retry_delay
+
+# Module-level session so sequential posts reuse one keep-alive connection to the webhook host.
+_session = requests.Session()
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?]) +")
 
 _GENERIC_FEATURES = frozenset({
     "BPO Services", "Consultation", "Talent Outsourcing",
     "International Logistics BPO", "E-Recovery", "Process Automation", "Services",
 })
 
+_TEAMS_TEMPLATE = (
+    "### \U0001f680 AI Tool {idx}: {title}\n\n"
+    "{website_line}"
+    "**\U0001f517 Source:** [{source}]({source})\n\n"
+    "**\U0001f3af Target Audience / Use Case:** {target}\n\n"
+    "**\U0001f4dd Overview:**\n{overview}\n\n"
+    "**\U0001f4a1 Key Features:**\n{features}\n\n"
+    "**\U0001f4b2 Pricing:** {pricing}\n\n"
+)
+
 
 def format_tool_for_teams(tool: ToolInfo, idx: int) -> str:
     """Format a ToolInfo as a Markdown message suitable for Microsoft Teams."""
-    features = list(dict.fromkeys(tool.features or []))
-    features = [f for f in features if f not in _GENERIC_FEATURES and len(f) > 5]
+    seen: set[str] = set()
+    features = [
+        f for f in tool.features
+        if len(f) > 5 and f not in _GENERIC_FEATURES and not (f in seen or seen.add(f))
+    ]
     features_str = "\n".join(f"- {f}" for f in features) if features else "N/A"
 
     pricing = tool.pricing
-    if not pricing or len(str(pricing).split()) > 20 or (isinstance(pricing, str) and "revolution" in pricing.lower()):
+    if not pricing or len(pricing.split()) > 20 or "revolution" in pricing.lower():
         pricing = "No pricing information available."
 
     overview = tool.summary or (tool.main_text[:300] if tool.main_text else "")
     if overview:
-        sentences = re.split(r"(?<=[.!?]) +", overview)
-        if len(sentences) > 5:
-            overview = " ".join(sentences[:5])
-        elif len(overview.split()) > 80:
-            overview = " ".join(overview.split()[:80]) + "..."
+        # Keep the first 5 sentences; stop scanning at the 5th boundary instead of splitting the whole text.
+        fifth_boundary = next(islice(_SENTENCE_SPLIT.finditer(overview), 4, None), None)
+        if fifth_boundary:
+            overview = overview[: fifth_boundary.start()]
+        else:
+            words = overview.split(None, 80)
+            if len(words) > 80:
+                overview = " ".join(words[:80]) + "..."
     overview = overview or "N/A"
 
     target = tool.target_audience if tool.target_audience and len(tool.target_audience) >= 3 else "N/A"
 
-    tags_str = ", ".join(tool.tags) if tool.tags else "N/A"
-
     website_line = f"**\U0001f310 Website:** [{tool.website}]({tool.website})\n\n" if tool.website != tool.source else ""
 
-    return (
-        f"### \U0001f680 AI Tool {idx}: {tool.title or 'N/A'}\n\n"
-        f"{website_line}"
-        f"**\U0001f517 Source:** [{tool.source}]({tool.source})\n\n"
-        f"**\U0001f3af Target Audience / Use Case:** {target}\n\n"
-        f"**\U0001f4dd Overview:**\n{overview}\n\n"
-        f"**\U0001f4a1 Key Features:**\n{features_str}\n\n"
-        f"**\U0001f4b2 Pricing:** {pricing}\n\n"
-    )
+    return _TEAMS_TEMPLATE.format_map({
+        "idx": idx,
+        "title": tool.title or "N/A",
+        "website_line": website_line,
+        "source": tool.source,
+        "target": target,
+        "overview": overview,
+        "features": features_str,
+        "pricing": pricing,
+    })
 
 
 def send_tool_to_teams(tool: ToolInfo, idx: int, webhook_url: str) -> None:
@@ -55,10 +79,39 @@ def send_tool_to_teams(tool: ToolInfo, idx: int, webhook_url: str) -> None:
 
     payload = {"text": format_tool_for_teams(tool, idx)}
     try:
-        response = requests.post(webhook_url, json=payload, timeout=15)
+        response = _session.post(webhook_url, json=payload, timeout=15)
         if response.status_code == 200:
             logging.info(f"Tool {idx} sent to Microsoft Teams successfully.")
         else:
             logging.error(f"Failed to send tool {idx} to Teams: {response.status_code} {response.text}")
     except requests.RequestException as e:
         logging.error(f"Teams webhook request failed for tool {idx}: {e}")
+
+
+async def send_tool_to_teams_async(
+    tool: ToolInfo, idx: int, webhook_url: str, session: aiohttp.ClientSession, retries: int = 3
+) -> None:
+    """Post a formatted tool message to Microsoft Teams via webhook on a shared aiohttp session.
+    Lets callers send messages concurrently; HTTP 429 responses are retried after the
+    webhook's Retry-After delay (or jittered backoff) so throttled messages aren't lost.
+    """
+    if not webhook_url:
+        logging.warning("TEAMS_WEBHOOK_URL not set. Skipping Teams notification.")
+        return
+
+    payload = {"text": format_tool_for_teams(tool, idx)}
+    try:
+        for attempt in range(retries):
+            async with session.post(webhook_url, json=payload, timeout=aiohttp.ClientTimeout(total=15)) as response:
+                if response.status == 200:
+                    logging.info(f"Tool {idx} sent to Microsoft Teams successfully.")
+                    return
+                if response.status == 429 and attempt < retries - 1:
+                    delay = retry_delay(response.headers, attempt, base=2)
+                    logging.warning(f"Teams rate limited tool {idx}, retrying in {delay:.1f}s...")
+                    await asyncio.sleep(delay)
+                    continue
+                logging.error(f"Failed to send tool {idx} to Teams: {response.status} {await response.text()}")
+                return
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logging.error(f"Teams webhook request failed for tool {idx}: {e}")
@@ -0,0 +1,22 @@
+import pytest
+
+from agents import scraper_agent
+from utils.blacklist import PersistentBlacklist
+
+
+class _UnusedSession:
+    """Stand-in session that fails the test if any request is attempted."""
+
+    def get(self, *args, **kwargs):
+        raise AssertionError("fetch_with_retries made a request for a blacklisted domain")
+
+
+@pytest.mark.asyncio
+async def test_fetch_with_retries_skips_blacklisted_domain(tmp_path, monkeypatch):
+    blacklist = PersistentBlacklist(path=str(tmp_path / "blacklist.json"), threshold=1)
+    blacklist.record_failure("blocked.example.com")
+    monkeypatch.setattr(scraper_agent, "blacklist", blacklist)
+
+    html = await scraper_agent.fetch_with_retries("https://www.blocked.example.com/tool", _UnusedSession())
+
+    assert html == ""
@@ -1,23 +1,32 @@
-import json
+import atexit
 import logging
 import os
 from typing import Dict, List, Set
 
+import orjson
+
+from utils.domain import normalize
+
 BLACKLIST_DIR = "data"
 BLACKLIST_FILE = os.path.join(BLACKLIST_DIR, "blacklist.json")
 FAILURE_THRESHOLD = 3
 
 
 class PersistentBlacklist:
-    """Tracks domains that repeatedly fail and persists them across runs."""
+    """Tracks domains that repeatedly fail and persists them across runs.
+    Failures are recorded in memory only; the file is rewritten by `save()`
+    (also run at interpreter exit) and only when something has changed.
+    """
 
     def __init__(self, path: str = BLACKLIST_FILE, threshold: int = FAILURE_THRESHOLD) -> None:
         self.path = path
         self.threshold = threshold
         self.domains: Set[str] = set()
         self.failures: Dict[str, int] = {}
+        self._dirty = False
         self._ensure_dir()
         self.load()
+        atexit.register(self.save)
 
     def _ensure_dir(self) -> None:
         os.makedirs(os.path.dirname(self.path), exist_ok=True)
@@ -26,25 +35,33 @@ class PersistentBlacklist:
         if not os.path.exists(self.path):
             return
         try:
-            with open(self.path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                self.domains = set(data.get("blacklist", []))
-                self.failures = data.get("failures", {})
-        except (json.JSONDecodeError, OSError) as e:
+            with open(self.path, "rb") as f:
+                data = orjson.loads(f.read())
+            self.domains = {normalize(d) for d in data.get("blacklist", [])}
+            self.failures = {}
+            for d, n in data.get("failures", {}).items():
+                d = normalize(d)
+                self.failures[d] = self.failures.get(d, 0) + n
+        except (orjson.JSONDecodeError, OSError) as e:
             logging.warning(f"Failed to load blacklist from {self.path}: {e}")
             self.domains = set()
             self.failures = {}
 
     def save(self) -> None:
-        with open(self.path, "w", encoding="utf-8") as f:
-            json.dump({"blacklist": sorted(self.domains), "failures": self.failures}, f, indent=2)
+        if not self._dirty:
+            return
+        with open(self.path, "wb") as f:
+            f.write(orjson.dumps({"blacklist": sorted(self.domains), "failures": self.failures}))
+        self._dirty = False
 
     def is_blacklisted(self, domain: str) -> bool:
-        return domain.lower() in self.domains
+        """Check a domain against the blacklist. Callers must pass it through utils.domain.normalize first."""
+        return domain in self.domains
 
     def record_failure(self, domain: str) -> None:
-        domain = domain.lower()
+        domain = normalize(domain)
         self.failures[domain] = self.failures.get(domain, 0) + 1
+        self._dirty = True
         if self.failures[domain] >= self.threshold:
             self.domains.add(domain)
 
@@ -0,0 +1,6 @@
+def normalize(host: str) -> str:
+    """Canonical form of a host for domain-keyed lookups: lowercased, without a leading 'www.'.
+    Unlike `.lstrip("www.")`, `removeprefix` only drops the exact prefix, so hosts such as
+    'web.dev' or 'wwwhatsnew.com' are left intact.
+    """
+    return host.lower().removeprefix("www.")
@@ -19,6 +19,11 @@ class ExtractionError(AgentError):
     pass
 
 
+class MalformedBatchError(ExtractionError):
+    """Raised when a batched LLM call fails in a way a smaller batch may fix (malformed/empty results, context overflow)."""
+    pass
+
+
 class ConfigError(AgentError):
     """Raised for configuration or environment variable errors."""
     pass
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, NamedTuple, Optional
+
+import diskcache
+
+HTML_CACHE_DIR = os.path.join("data", "html_cache")
+HTML_CACHE_TTL = 3 * 24 * 60 * 60  # Pages younger than this are served without a request
+HTML_CACHE_RETENTION = 30 * 24 * 60 * 60  # Stale pages are kept this long for conditional requests
+ROBOTS_CACHE_TTL = 24 * 60 * 60  # Raw robots.txt bodies are reused for this long
+ROBOTS_FAILURE_TTL = 60 * 60  # Timeouts/connection errors are retried sooner than real responses
+
+_cache: Optional[diskcache.Cache] = None
+
+
+class CachedPage(NamedTuple):
+    """A previously fetched page plus the validators needed to revalidate it."""
+
+    html: str
+    fetched_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class CachedRobots(NamedTuple):
+    """A robots.txt fetch outcome. `status` is the HTTP status, or 0 if the request failed;
+    `content` is empty for anything but a 200.
+    """
+
+    content: str
+    status: int
+    fetched_at: float
+
+
+def _get_cache() -> diskcache.Cache:
+    """Lazily open the on-disk cache on first use."""
+    global _cache
+    if _cache is None:
+        _cache = diskcache.Cache(HTML_CACHE_DIR)
+    return _cache
+
+
+def get_entry(url: str) -> Optional[CachedPage]:
+    """Return the cached page for a URL regardless of age, or None on a miss."""
+    try:
+        entry = _get_cache().get(url)
+    except Exception as e:
+        logging.warning(f"Failed to read HTML cache for {url}: {e}")
+        return None
+    return CachedPage(*entry) if entry else None
+
+
+def is_fresh(entry: CachedPage, ttl: float = HTML_CACHE_TTL) -> bool:
+    """True if a cached page was fetched within the last `ttl` seconds and can be served as-is."""
+    return time.time() - entry.fetched_at < ttl
+
+
+def put(
+    url: str,
+    html: str,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+    expire: float = HTML_CACHE_RETENTION,
+) -> None:
+    """Store fetched HTML and its HTTP validators, stamped with the current time."""
+    try:
+        _get_cache().set(url, tuple(CachedPage(html, time.time(), etag, last_modified)), expire=expire)
+    except Exception as e:
+        logging.warning(f"Failed to write HTML cache for {url}: {e}")
+
+
+async def get_entry_async(url: str) -> Optional[CachedPage]:
+    """get_entry run in a worker thread so the SQLite read doesn't block the event loop."""
+    return await asyncio.to_thread(get_entry, url)
+
+
+async def put_async(
+    url: str,
+    html: str,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+    expire: float = HTML_CACHE_RETENTION,
+) -> None:
+    """put run in a worker thread so pickling and writing the page doesn't block the event loop."""
+    await asyncio.to_thread(put, url, html, etag, last_modified, expire)
+
+
+def conditional_headers(entry: CachedPage) -> Dict[str, str]:
+    """Build If-None-Match / If-Modified-Since headers for revalidating a cached page."""
+    headers: Dict[str, str] = {}
+    if entry.etag:
+        headers["If-None-Match"] = entry.etag
+    if entry.last_modified:
+        headers["If-Modified-Since"] = entry.last_modified
+    return headers
+
+
+def get_robots(robots_url: str) -> Optional[CachedRobots]:
+    """Return the cached robots.txt outcome for a URL, or None if missing or expired."""
+    try:
+        entry = _get_cache().get(("robots", robots_url))
+    except Exception as e:
+        logging.warning(f"Failed to read robots.txt cache for {robots_url}: {e}")
+        return None
+    return CachedRobots(*entry) if entry else None
+
+
+def set_robots(robots_url: str, content: str, status: int = 200, expire: Optional[float] = None) -> None:
+    """Store a robots.txt outcome for reuse by later runs.
+    Failed requests (status 0) expire after ROBOTS_FAILURE_TTL, everything else after ROBOTS_CACHE_TTL.
+    """
+    if expire is None:
+        expire = ROBOTS_CACHE_TTL if status else ROBOTS_FAILURE_TTL
+    try:
+        _get_cache().set(("robots", robots_url), tuple(CachedRobots(content, status, time.time())), expire=expire)
+    except Exception as e:
+        logging.warning(f"Failed to write robots.txt cache for {robots_url}: {e}")
@@ -0,0 +1,39 @@
+import logging
+
+from selectolax.lexbor import LexborHTMLParser
+
+# Elements that never carry product information but often dominate the first bytes of a page
+_NOISE_TAGS = ["script", "style", "noscript", "svg", "iframe", "template", "nav", "footer"]
+
+
+def _meta_content(tree: LexborHTMLParser, selector: str, attr: str) -> str:
+    node = tree.css_first(selector)
+    return (node.attributes.get(attr) or "").strip() if node else ""
+
+
+def extract_main_content(html: str) -> str:
+    """Reduce raw HTML to the text an LLM needs to classify and summarize the page.
+
+    Returns a short header (title, meta description, canonical URL) followed by the
+    visible body text with scripts, styles, and navigation removed. Falls back to the
+    raw HTML if parsing fails.
+    """
+    try:
+        tree = LexborHTMLParser(html)
+        title_node = tree.css_first("title")
+        header = [
+            ("Title", title_node.text(strip=True) if title_node else ""),
+            ("Description", _meta_content(tree, 'meta[name="description"]', "content")
+             or _meta_content(tree, 'meta[property="og:description"]', "content")),
+            ("Canonical", _meta_content(tree, 'link[rel="canonical"]', "href")),
+        ]
+        tree.strip_tags(_NOISE_TAGS)
+        root = tree.body or tree.root
+        body_text = root.text(separator=" ", strip=True) if root else ""
+    except Exception as e:
+        logging.warning(f"Failed to extract main content from HTML: {e}")
+        return html
+
+    lines = [f"{label}: {value}" for label, value in header if value]
+    lines.append(body_text)
+    return "\n".join(lines)
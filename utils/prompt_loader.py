@@ -1,16 +1,32 @@
+import asyncio
+import functools
 import logging
 import os
-from typing import Dict
+import time
+from typing import Dict, Optional
 from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
 
 import aiohttp
 
-_robots_cache: Dict[str, str] = {}
+from utils import html_cache
+
+_robots_cache: Dict[str, Optional[RobotFileParser]] = {}  # None = no usable robots.txt
+_robots_locks: Dict[str, asyncio.Lock] = {}
+_shared_session: Optional[aiohttp.ClientSession] = None
 _PROMPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "prompts")
 
 
+@functools.lru_cache(maxsize=None)
+def _read_prompt(filename: str) -> str:
+    path = os.path.join(_PROMPTS_DIR, filename)
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
 def load_prompt(filename: str) -> str:
     """Load a prompt template from the prompts directory.
+    Each file is read from disk once per process; later calls hit an in-memory cache.
 
     Args:
         filename: Name of the prompt file (e.g. 'system_prompt.txt').
@@ -21,14 +37,69 @@ def load_prompt(filename: str) -> str:
     Raises:
         FileNotFoundError: If the prompt file does not exist.
     """
-    path = os.path.join(_PROMPTS_DIR, filename)
-    with open(path, "r", encoding="utf-8") as f:
-        return f.read()
+    return _read_prompt(filename)
+
+
+async def _get_session() -> aiohttp.ClientSession:
+    """Lazily create the session shared by all robots.txt fetches."""
+    global _shared_session
+    if _shared_session is None or _shared_session.closed:
+        _shared_session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=50, ttl_dns_cache=300))
+    return _shared_session
+
+
+async def close_session() -> None:
+    """Close the shared robots.txt session, if one was opened."""
+    global _shared_session
+    if _shared_session is not None:
+        await _shared_session.close()
+        _shared_session = None
+
+
+async def _fetch_robots(robots_url: str) -> html_cache.CachedRobots:
+    """Fetch robots.txt once and record the outcome (including failures) in the disk cache."""
+    try:
+        session = await _get_session()
+        async with session.get(robots_url, timeout=aiohttp.ClientTimeout(total=10)) as resp:
+            status = resp.status
+            content = await resp.text() if status == 200 else ""
+    except Exception as e:
+        logging.warning(f"Error fetching robots.txt for {robots_url}: {e}")
+        status, content = 0, ""
+    html_cache.set_robots(robots_url, content, status)
+    return html_cache.CachedRobots(content, status, time.time())
+
+
+async def _get_robots_parser(scheme: str, netloc: str) -> Optional[RobotFileParser]:
+    """Return the parsed robots.txt for a host, fetching it at most once per run.
+    Concurrent callers for the same host wait on a per-host lock instead of
+    issuing duplicate requests. Non-200 responses and failed requests are cached
+    too, so a dead host is tried once rather than once per URL. Returns None if
+    robots.txt is unavailable.
+    """
+    if netloc in _robots_cache:
+        return _robots_cache[netloc]
+
+    lock = _robots_locks.setdefault(netloc, asyncio.Lock())
+    async with lock:
+        if netloc in _robots_cache:
+            return _robots_cache[netloc]
+
+        robots_url = f"{scheme}://{netloc}/robots.txt"
+        entry = html_cache.get_robots(robots_url) or await _fetch_robots(robots_url)
+
+        parser: Optional[RobotFileParser] = None
+        if entry.status == 200:
+            parser = RobotFileParser(robots_url)
+            parser.parse(entry.content.splitlines())
+        _robots_cache[netloc] = parser
+        return parser
 
 
 async def is_allowed_by_robots(url: str, user_agent: str = "Mozilla/5.0") -> bool:
     """Check robots.txt to determine if fetching the URL is permitted.
-    Results are cached per domain for efficiency.
+    Parsed rules are cached per domain in-process, and fetch outcomes are
+    persisted in the on-disk cache (24 hours, or 1 hour for failed requests).
     Returns True when in doubt (missing/malformed robots.txt or errors).
     """
     try:
@@ -36,39 +107,16 @@ async def is_allowed_by_robots(url: str, user_agent: str = "Mozilla/5.0") -> boo
         if not parsed.scheme or not parsed.netloc:
             logging.warning(f"Invalid URL for robots.txt check: {url}")
             return True
-        robots_url = f"{parsed.scheme}://{parsed.netloc}/robots.txt"
     except Exception as e:
         logging.warning(f"Exception parsing URL for robots.txt: {url} | {e}")
         return True
 
-    if robots_url in _robots_cache:
-        content = _robots_cache[robots_url]
-    else:
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(robots_url, timeout=aiohttp.ClientTimeout(total=10)) as resp:
-                    if resp.status != 200:
-                        return True
-                    content = await resp.text()
-                    _robots_cache[robots_url] = content
-        except Exception as e:
-            logging.warning(f"Error fetching robots.txt for {robots_url}: {e}")
-            return True
+    parser = await _get_robots_parser(parsed.scheme, parsed.netloc)
+    if parser is None:
+        return True
 
     try:
-        allowed = True
-        current_ua = None
-        for line in content.splitlines():
-            line = line.strip()
-            if line.lower().startswith("user-agent:"):
-                current_ua = line.split(":", 1)[1].strip()
-            elif line.lower().startswith("disallow:") and (
-                current_ua == "*" or (current_ua is not None and user_agent in current_ua)
-            ):
-                path = line.split(":", 1)[1].strip()
-                if path and parsed.path.startswith(path):
-                    allowed = False
-        return allowed
+        return parser.can_fetch(user_agent, url)
     except Exception as e:
-        logging.warning(f"Malformed robots.txt for {robots_url}: {e}")
+        logging.warning(f"Malformed robots.txt for {parsed.netloc}: {e}")
         return True
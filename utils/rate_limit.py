@@ -0,0 +1,54 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class AsyncTokenBucket:
+    """Token-bucket rate limiter for coroutines with AIMD rate adaptation.
+
+    Tokens refill continuously at `rate` per second up to `capacity`. When the
+    provider throttles us, `throttle()` halves the rate and can pause all callers
+    for a Retry-After period; each success then adds back a tenth of the
+    configured rate until it is reached again.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, min_rate: float = 0.5) -> None:
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate * 2
+        self.min_rate = min_rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Wait until a token is available, then consume it. Waiters are served in FIFO order."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def throttle(self, retry_after: Optional[float] = None) -> None:
+        """Halve the refill rate and, if given, pause all acquisitions for `retry_after` seconds."""
+        self._refill(time.monotonic())
+        self.rate = max(self.min_rate, self.rate / 2)
+        if retry_after:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+
+    def record_success(self) -> None:
+        """Additively raise the refill rate back towards its configured maximum."""
+        if self.rate < self.max_rate:
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
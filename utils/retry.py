@@ -0,0 +1,49 @@
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional
+
+MAX_BACKOFF_SECONDS = 60.0
+
+
+def backoff_delay(attempt: int, base: float, cap: float = MAX_BACKOFF_SECONDS) -> float:
+    """Exponential backoff for a zero-based attempt number, with +/-50% jitter.
+    Jitter keeps concurrent retries from re-colliding in lockstep.
+    """
+    return min(cap, base * 2**attempt * random.uniform(0.5, 1.5))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given as delta-seconds or an HTTP date.
+    Returns None if the header is absent or unparseable.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_delay(
+    headers: Optional[Mapping[str, str]], attempt: int, base: float, cap: float = MAX_BACKOFF_SECONDS
+) -> float:
+    """Seconds to wait before the next attempt.
+    Honours server hints (Azure's `retry-after-ms`, then `Retry-After`) when present,
+    otherwise falls back to jittered exponential backoff.
+    """
+    if headers:
+        retry_after_ms = headers.get("retry-after-ms")
+        if retry_after_ms:
+            try:
+                return min(cap, max(0.0, float(retry_after_ms) / 1000))
+            except ValueError:
+                pass
+        retry_after = parse_retry_after(headers.get("retry-after"))
+        if retry_after is not None:
+            return min(cap, retry_after)
+    return backoff_delay(attempt, base, cap)